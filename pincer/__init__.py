@@ -5,8 +5,25 @@ Created on Tue Nov 21 13:34:28 2023
 @author: mbmad
 """
 
-from pincer.main import Pincer
-from pincer.main import AnalysisManager
-from pincer.main import StatsManager
-from pincer.main import PincerABF
-from pincer.main import ROI
\ No newline at end of file
+import importlib
+
+# Public names are resolved on first access so that importing pincer (or an
+# analysis module, which does 'from pincer import ROI') does not pull in
+# pandas and pyabf until they are actually needed.
+_lazy = {'Pincer' : 'pincer.main',
+         'AnalysisManager' : 'pincer.analysis_base',
+         'StatsManager' : 'pincer.analysis_base',
+         'PincerABF' : 'pincer.abfHelper',
+         'ROI' : 'pincer.roi'}
+
+__all__ = list(_lazy)
+
+def __getattr__(name):
+    if name in _lazy:
+        value = getattr(importlib.import_module(_lazy[name]), name)
+        globals()[name] = value
+        return value
+    raise AttributeError("module 'pincer' has no attribute " + repr(name))
+
+def __dir__():
+    return sorted(list(globals()) + list(_lazy))
@@ -2,50 +2,109 @@
 """
 Contains various managers and parent classes for expandable plugin system.
 
+Plugins register themselves when their module is imported (see
+__init_subclass__). Managers also hold a catalog mapping plugin names to the
+module that defines them, so a plugin's module is only imported the first
+time that plugin is requested. Third party packages can add to the catalog
+through the 'pincer.analyses' and 'pincer.comparisons' entry point groups,
+where each entry point is written as name = module:Class. The plugin is made
+available under the entry point name, which need not match the class name.
+
 """
 
-class StatsManager():
+import importlib
+from importlib import metadata
+
+class _PluginManager():
     _registry = {}
+    _catalog = {}
+    _entrypointgroup = None
+    _kind = 'Plugins'
+
     def __init__(self):
         pass
-    
+
     def make(self,name,**kwargs):
-        return self._registry[name](**kwargs)
-    
+        return self.get(name)(**kwargs)
+
+    def get(self,name):
+        if name not in self._registry:
+            self._load(name)
+        return self._registry[name]
+
+    def available(self):
+        names = list(self._registry)
+        names += [i for i in self._fullcatalog() if i not in self._registry]
+        return names
+
     def report(self):
-        print('Available Comparisons:')
+        print('Available '+self._kind+':')
         print('-------------------')
-        for i in self._registry:
+        for i in self.available():
             print(i)
 
-class AnalysisManager():
+    @classmethod
+    def _load(cls,name):
+        catalog = cls._fullcatalog()
+        if name not in catalog:
+            raise KeyError(name + ' is not available, use one of: ' + ', '.join(catalog))
+        if isinstance(catalog[name], metadata.EntryPoint):
+            cls._registry[name] = catalog[name].load()
+            return
+        importlib.import_module(catalog[name])
+        if name not in cls._registry:
+            raise KeyError(name + ' was not registered by module ' + catalog[name])
+
+    @classmethod
+    def _fullcatalog(cls):
+        # entry points are only scanned once per process and then cached
+        if '_epcatalog' not in cls.__dict__:
+            cls._epcatalog = {}
+            if cls._entrypointgroup is not None:
+                for ep in metadata.entry_points(group = cls._entrypointgroup):
+                    cls._epcatalog[ep.name] = ep
+        return cls._catalog | cls._epcatalog
+
+class StatsManager(_PluginManager):
     _registry = {}
-    def __init__(self):
-        pass
-    
-    def make(self,name,**kwargs):
-        return self._registry[name](**kwargs)
-    
-    def report(self):
-        print('Available Analyses:')
-        print('-------------------')
-        for i in self._registry:
-            print(i)
-            
+    _catalog = {'T_Test' : 'pincer.comparisons_stock',
+                'MannWhitney' : 'pincer.comparisons_stock',
+                'PermutationTest' : 'pincer.comparisons_stock',
+                'BootstrapTest' : 'pincer.comparisons_stock'}
+    _entrypointgroup = 'pincer.comparisons'
+    _kind = 'Comparisons'
+
+class AnalysisManager(_PluginManager):
+    _registry = {}
+    _catalog = {'PeakMagnitude' : 'pincer.analyses.basic',
+                'AreaUnderCurve' : 'pincer.analyses.basic',
+                'CountThresholdEvents' : 'pincer.analyses.basic',
+                'CRACM_Current_LightPulse' : 'pincer.analyses.cracm',
+                'PairedPulse' : 'pincer.analyses.pairedpulse',
+                'Current_Basic_Rheoramp' : 'pincer.analyses.special',
+                'Current_Steps_MaxFiring' : 'pincer.analyses.special'}
+    _entrypointgroup = 'pincer.analyses'
+    _kind = 'Analyses'
+
 class PincerComparison():
+    # label is the column of cellLabels ('cell') or animalLabels ('animal')
+    # that defines the groups, Pincer passes the matching labels frame to run
+    label = None
+    labelsource = 'cell'
+
     def __init_subclass__(cls,**kwargs):
         super().__init_subclass__(**kwargs)
         StatsManager._registry[cls.__name__] = cls
-        
-    def run(self, *series):
+
+    def run(self, results, labels):
         print('Warning! Missing Run Method!')
         return {'ERROR1':1,'ERROR2':2}
-    
+
 class PincerAnalysis():
-    def __init_subclass__(cls,**kwargs):        
+    def __init_subclass__(cls,**kwargs):
         super().__init_subclass__(**kwargs)
         AnalysisManager._registry[cls.__name__] = cls
-        
+
     def run(self, ABF):
         print('Warning! Missing Run Method!')
-        return {'ERROR1':1,'ERROR2':2}   
\ No newline at end of file
+        return {'ERROR1':1,'ERROR2':2}
@@ -3,9 +3,193 @@
 Created on Wed Dec 13 17:18:56 2023
 
 @author: mbmad
+
+Stock two-group comparisons. Every comparison tests all (Trace, Output)
+columns of the results at once: results are converted to a single
+(cells x outputs) float array, missing values are carried as a mask, and
+per-column sums and counts are taken with matrix products so no python loop
+runs over outputs or resamples.
+
+With labelsource = 'animal' the cells of each animal (Day) are first averaged
+and the test is run on those per-animal means, so the sample size is the
+number of animals rather than the number of cells.
 """
+import warnings
+import numpy as np
+import pandas
+from scipy import special
 import pincer.analysis_base as ban
 
-class T_Test (ban.PincerComparison):    
-    def __init__(self,testtype,identifiers):
-        pass
\ No newline at end of file
+class _TwoGroupComparison():
+    def __init__(self, label, groups = None, labelsource = 'cell'):
+        assert labelsource == 'cell' or labelsource == 'animal', 'labelsource must be cell or animal'
+        assert groups is None or len(groups) == 2, 'groups must be None or two group names'
+        self.label = label
+        self.groups = groups
+        self.labelsource = labelsource
+
+    def run(self, results, labels):
+        """
+        Compare two groups across every column of results. labels is
+        cellLabels (indexed by Day, Slice, Cell) or animalLabels (indexed by
+        Day), matching labelsource. Groups are of cells for 'cell' and of
+        per-animal means for 'animal'. Returns a DataFrame indexed by
+        (Trace, Output) with group sizes, group means, statistic and p-value.
+        """
+        g1, g2 = self._getgroups(results, labels)
+        x1, x2 = self._splitdata(results, labels, g1, g2)
+        n1 = np.sum(~np.isnan(x1), axis = 0)
+        n2 = np.sum(~np.isnan(x2), axis = 0)
+        # columns with too few observations give nan rather than warnings
+        with np.errstate(divide = 'ignore', invalid = 'ignore'), warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            stats = {'N '+str(g1) : n1,
+                     'N '+str(g2) : n2,
+                     'Mean '+str(g1) : np.nansum(x1, axis = 0)/n1,
+                     'Mean '+str(g2) : np.nansum(x2, axis = 0)/n2}
+            stats = stats | self._test(x1, x2)
+        return pandas.DataFrame(stats, index = results.columns)
+
+    def _samples(self, results):
+        values = results.apply(pandas.to_numeric, errors = 'coerce').astype(float)
+        if self.labelsource == 'animal':
+            # one sample per animal, avoids treating cells of an animal as independent
+            values = values.groupby(level = 0, sort = True).mean()
+        return values
+
+    def _getgroups(self, results, labels):
+        if self.groups is not None:
+            return self.groups
+        found = pandas.unique(labels[self.label].dropna())
+        assert len(found) == 2, 'label ' + str(self.label) + ' has ' + str(len(found)) + ' groups, specify groups'
+        return tuple(found)
+
+    def _splitdata(self, results, labels, g1, g2):
+        values = self._samples(results)
+        grouplabels = labels[self.label].reindex(values.index).to_numpy()
+        assert (grouplabels == g1).any() and (grouplabels == g2).any(), 'both groups must contain at least one sample'
+        values = values.to_numpy()
+        return values[grouplabels == g1], values[grouplabels == g2]
+
+class _ResamplingComparison(_TwoGroupComparison):
+    def __init__(self, label, groups = None, labelsource = 'cell', nresamples : int = 10000, seed = None, chunksize : int = 2000):
+        super().__init__(label, groups = groups, labelsource = labelsource)
+        assert type(nresamples) == int and nresamples > 0, 'nresamples must be int greater than zero'
+        assert type(chunksize) == int and chunksize > 0, 'chunksize must be int greater than zero'
+        self.nresamples = nresamples
+        self.seed = seed
+        self.chunksize = chunksize
+
+    def _chunks(self):
+        done = 0
+        while done < self.nresamples:
+            size = min(self.chunksize, self.nresamples - done)
+            done += size
+            yield size
+
+def _masked(x):
+    # returns values with missing set to zero and the observed mask as floats,
+    # so that weights @ values / weights @ mask gives per-column weighted means
+    observed = ~np.isnan(x)
+    return np.where(observed, x, 0.0), observed.astype(float)
+
+class T_Test(_TwoGroupComparison, ban.PincerComparison):
+    def __init__(self, label, groups = None, labelsource = 'cell', equal_var = False):
+        super().__init__(label, groups = groups, labelsource = labelsource)
+        self.equal_var = equal_var
+
+    def _test(self, x1, x2):
+        n1 = np.sum(~np.isnan(x1), axis = 0)
+        n2 = np.sum(~np.isnan(x2), axis = 0)
+        v1 = np.nanvar(x1, axis = 0, ddof = 1)
+        v2 = np.nanvar(x2, axis = 0, ddof = 1)
+        diff = np.nanmean(x1, axis = 0) - np.nanmean(x2, axis = 0)
+        if self.equal_var:
+            df = n1 + n2 - 2
+            pooled = ((n1 - 1)*v1 + (n2 - 1)*v2)/df
+            se = np.sqrt(pooled*(1/n1 + 1/n2))
+        else:
+            a1 = v1/n1
+            a2 = v2/n2
+            se = np.sqrt(a1 + a2)
+            df = (a1 + a2)**2/(a1**2/(n1 - 1) + a2**2/(n2 - 1))
+        t = diff/se
+        p = special.stdtr(df, -np.abs(t))*2
+        return {'Statistic' : t, 'DF' : df, 'p-value' : p}
+
+class MannWhitney(_TwoGroupComparison, ban.PincerComparison):
+    """
+    Two-sided Mann-Whitney U test using the normal approximation with tie and
+    continuity correction.
+    """
+    def _test(self, x1, x2):
+        combined = pandas.DataFrame(np.concatenate([x1, x2]))
+        ranks = combined.rank(axis = 0).to_numpy()
+        # size of the tie group each value belongs to
+        ties = (combined.rank(axis = 0, method = 'max') - combined.rank(axis = 0, method = 'min') + 1).to_numpy()
+        n1 = np.sum(~np.isnan(x1), axis = 0)
+        n2 = np.sum(~np.isnan(x2), axis = 0)
+        n = n1 + n2
+        u = np.nansum(ranks[:len(x1)], axis = 0) - n1*(n1 + 1)/2
+        tiesum = np.nansum(ties**2 - 1, axis = 0)
+        sigma = np.sqrt(n1*n2/12*((n + 1) - tiesum/(n*(n - 1))))
+        z = (np.abs(u - n1*n2/2) - 0.5)/sigma
+        p = np.clip(special.erfc(z/np.sqrt(2)), 0, 1)
+        return {'Statistic' : u, 'p-value' : p}
+
+class PermutationTest(_ResamplingComparison, ban.PincerComparison):
+    """
+    Two-sided permutation test on the difference in group means. Group labels
+    are shuffled across samples, nresamples times.
+    """
+    def _test(self, x1, x2):
+        values, observed = _masked(np.concatenate([x1, x2]))
+        sums = values.sum(axis = 0)
+        counts = observed.sum(axis = 0)
+        diff = np.nanmean(x1, axis = 0) - np.nanmean(x2, axis = 0)
+        rng = np.random.default_rng(self.seed)
+        membership = np.zeros(len(values))
+        membership[:len(x1)] = 1
+        extreme = np.zeros(values.shape[1])
+        valid = np.zeros(values.shape[1])
+        for size in self._chunks():
+            shuffled = rng.permuted(np.tile(membership, (size, 1)), axis = 1)
+            s1 = shuffled @ values
+            c1 = shuffled @ observed
+            null = s1/c1 - (sums - s1)/(counts - c1)
+            extreme += np.sum(np.abs(null) >= np.abs(diff) - 1e-12, axis = 0)
+            valid += np.sum(~np.isnan(null), axis = 0)
+        p = (extreme + 1)/(valid + 1)
+        p[np.isnan(diff)] = np.nan
+        return {'Statistic' : diff, 'p-value' : p}
+
+class BootstrapTest(_ResamplingComparison, ban.PincerComparison):
+    """
+    Bootstrap of the difference in group means. Each group is resampled with
+    replacement on its own. Reports a percentile confidence interval and a
+    two-sided p-value for a difference of zero.
+    """
+    def __init__(self, label, groups = None, labelsource = 'cell', nresamples : int = 10000, seed = None, chunksize : int = 2000, confidence = 0.95):
+        super().__init__(label, groups = groups, labelsource = labelsource, nresamples = nresamples, seed = seed, chunksize = chunksize)
+        assert 0 < confidence < 1, 'confidence must be between 0 and 1'
+        self.confidence = confidence
+
+    def _test(self, x1, x2):
+        v1, o1 = _masked(x1)
+        v2, o2 = _masked(x2)
+        diff = np.nanmean(x1, axis = 0) - np.nanmean(x2, axis = 0)
+        rng = np.random.default_rng(self.seed)
+        boot = []
+        for size in self._chunks():
+            # multinomial counts act as bootstrap weights for each cell
+            w1 = rng.multinomial(len(x1), np.full(len(x1), 1/len(x1)), size = size)
+            w2 = rng.multinomial(len(x2), np.full(len(x2), 1/len(x2)), size = size)
+            boot.append((w1 @ v1)/(w1 @ o1) - (w2 @ v2)/(w2 @ o2))
+        boot = np.concatenate(boot)
+        alpha = (1 - self.confidence)/2
+        low, high = np.nanquantile(boot, [alpha, 1 - alpha], axis = 0)
+        valid = np.sum(~np.isnan(boot), axis = 0)
+        below = np.sum(boot <= 0, axis = 0)/valid
+        above = np.sum(boot >= 0, axis = 0)/valid
+        p = np.minimum(1, 2*np.minimum(below, above))
+        return {'Statistic' : diff, 'CI Low' : low, 'CI High' : high, 'p-value' : p}
@@ -10,84 +10,11 @@ from pathlib import Path, PurePath
 from pincer.analysis_base import AnalysisManager
 from pincer.abfHelper import PincerABF
 from pincer.analysis_base import StatsManager
-import pincer.comparisons_stock
-
-class ROI():
-    _defaultunits = {'us': 1,'ms':1000,'s':1000000,'sec':1000000,'min':60000000}
-    def __init__(self,region,unit = 'ms'):
-        self._units = self._defaultunits
-        assert unit in self._units.keys(), 'invalid unit, use one of: '+', '.join(list(self._units.keys()))
-        assert type(region) == tuple or type(region) == list, 'regions must be defined as a tuple or list of tuples'
-        if type(region) == tuple: region = [region]
-        
-        assert all([type(x) == tuple for x in region]), 'ranges must be tuples'
-        for i in region:
-            assert all([type(x) == int for x in i]), 'start and end of range must be int'
-            assert len(i) == 2, 'ranges may only be defined as (start,end)'
-            
-        self.region = region
-        self._mergeranges()
-        self.unit = unit
-        
-    def filt(self,trace):
-        assert type(trace) == np.ndarray, 'trace must be numpy.ndarray'
-        arrays = [trace[s:e] for s, e in self.region]
-        return np.concatenate(arrays)
-        
-    def samplcnv(self,hz):
-        assert hz < 100000, 'ROI cannot handle sample rates higher than 100khz'
-        self._units['samples'] = int(1/(hz/1000000))
-        self.convertunit('samples')
-        return self
-        
-    def _mergeranges(self):
-        result = []
-        for i in sorted(self.region):
-            result = result or [i]
-            if i[0] >= result[-1][1]:
-                result.append(i)
-            else:
-                old = result[-1]
-                result[-1] = (old[0], max(old[1], i[1]))
-        self.region = result
-    
-    def convertunit(self,unit):
-        assert unit in self._units.keys(), 'invalid unit, use one of: '+', '.join(list(self._units.keys())) 
-        self.region = [tuple([i*self._units[self.unit]//self._units[unit] for i in y]) for y in self.region]
-        self.unit = unit
-        
-    def _makefriendlywith(self,new):
-        newunit = min(self._units[self.unit],new._units[new.unit])
-        x = self._units | new._units
-        lookup = {v:k for k,v in x.items()}
-        if self._units[self.unit] != newunit: self.convertunit(lookup[newunit])
-        if new._units[new.unit] != newunit: new.convertunit(lookup[newunit])
-    
-    def __add__(self, new):
-        self._makefriendlywith(new)
-        result = self.region + new.region
-        return ROI(result, unit = self.unit)
-    
-    def __sub__(self,new):
-        pass
-    
-    def __iter__(self):
-        self._itcurr = -1
-        self._itmax = len(self.region)
-        return self
-    
-    def __next__(self):
-        if self._itcurr < self._itmax-1:
-            self._itcurr += 1
-            return self.region[self._itcurr]
-        else:
-            raise StopIteration
-    
-    def __repr__(self):
-        return 'Pincer Range of Interest (ROI) including ' + ' '.join(str(x) for x in self.region).replace('(','[') + ' in unit (' + self.unit + ')'    
+from pincer.roi import ROI
+from pincer.rollup import Rollup
 
 class Pincer():
-    def __init__(self,source,padfilename = 3):
+    def __init__(self,source,padfilename = 3, equalweight = False):
         # Setup dataframes
         self.source = Path(source)
         self._initiateDataFrames()
@@ -97,6 +24,7 @@ class Pincer():
         self.analysis_queue = {}
         self.secondary_ops_queue = []
         self.comparisons = []
+        self.rollup = Rollup(equalweight = equalweight)
         
     def _initiateDataFrames(self):
         rowmultiindex = pandas.MultiIndex(levels = [[],[],[]],
@@ -109,7 +37,9 @@ class Pincer():
         self.traceIndex = pandas.DataFrame()
         self.animalLabels = pandas.DataFrame()
         self.results = pandas.DataFrame(index=rowmultiindex, columns=colmultiindex)
+        self.sliceresults = pandas.DataFrame()
         self.animalresults = pandas.DataFrame()
+        self.comparisonresults = pandas.DataFrame()
 
     def import_formattedexcel(self,filepath):
         xls = pandas.ExcelFile(filepath)
@@ -123,7 +53,9 @@ class Pincer():
         self.animalLabels.to_excel(expfile, sheet_name = 'AnimalLabels', engine='xlswriter')
         self.traceIndex.to_excel(expfile, sheet_name='TraceIndex', engine='xlswriter')
         self.results.to_excel(expfile, sheet_name='Results', engine='xlswriter')
+        self.sliceresults.to_excel(expfile, sheet_name= 'Results by Slice', engine='xlswriter')
         self.animalresults.to_excel(expfile, sheet_name= 'Results by Animal', engine='xlswriter')
+        self.comparisonresults.to_excel(expfile, sheet_name= 'Comparisons', engine='xlswriter')
         expfile.close()
         del expfile 
     
@@ -136,6 +68,21 @@ class Pincer():
         op['inputIDs'] = resultsidentifiers
         op['func'] = function
         self.secondary_ops_queue.append(op)
+    
+    def queue_comparison(self, comparison):
+        self.comparisons.append(comparison)
+    
+    def compare(self):
+        frames = {}
+        for position, comparison in enumerate(self.comparisons):
+            labels = self.animalLabels if comparison.labelsource == 'animal' else self.cellLabels
+            # queue position keeps names unique when a test is queued twice
+            name = str(position) + ': ' + type(comparison).__name__
+            if comparison.label is not None: name += ' (' + str(comparison.label) + ')'
+            frames[name] = comparison.run(self.results, labels)
+        if len(frames) > 0:
+            self.comparisonresults = pandas.concat(frames, names = ['Comparison'])
+        return self.comparisonresults
         
     def check(self):
         """
@@ -155,8 +102,15 @@ class Pincer():
         """Needs to be written!"""
         
         
-    def process(self, report = False, check = False):
+    def process(self, report = False, check = False, cells = None):
+        """
+        Run all queued analyses, secondary measures, rollups and comparisons.
+        If cells is given (an iterable of (Day, Slice, Cell) indexes) only
+        those cells are analysed again and only the slices and animals that
+        contain them are re-aggregated.
+        """
         go = True
+        if cells is not None: cells = set(cells)
         if check == True:
             go = self.check()
         if go == True:
@@ -164,6 +118,7 @@ class Pincer():
             for analysis in self.analysis_queue.keys():
                 if report == True: print('Performing '+ type(self.analysis_queue[analysis]).__name__ + 'analysis')
                 for index, row in self.traceIndex[analysis].iterrows(): #Dataframe with only relevant analyses
+                    if cells is not None and index not in cells: continue
                     #index is the index of the specific row, ROW is the series
                     for name, code in row.items():
                         #index is the cell index
@@ -187,8 +142,15 @@ class Pincer():
                 features = [self.results[*i] for i in op['inputIDs']]
                 featureframe = pandas.concat(features,axis = 1)
                 self.results['SecondaryOutputs',op['outputname']] = featureframe.apply(op['func'], axis = 1)
-            if report == True: print('Calculating Animalwise Measures!')
-            self.animalresults = self.results.groupby(level=0,axis=0).mean()
+            if report == True: print('Calculating Slicewise and Animalwise Measures!')
+            if cells is None:
+                self.rollup.fit(self.results)
+            else:
+                self.rollup.update(self.results, cells)
+            self.sliceresults = self.rollup.sliceresults
+            self.animalresults = self.rollup.animalresults
+            if report == True and len(self.comparisons) > 0: print('Running Comparisons')
+            self.compare()
             print('Done!')
         else:
             print('Processing aborted due to reported failed check')
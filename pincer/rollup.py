@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+Slice and animal level summaries of cell results.
+
+Rollup keeps the count, mean and sum of squared deviations (M2) of every
+(Trace, Output) column for each (Day, Slice). Animal summaries are built
+from those slice statistics rather than from the cells, so when only some
+cells change only their slices and animals are recomputed.
+"""
+
+import numpy as np
+import pandas
+
+class Rollup():
+    def __init__(self, equalweight = False):
+        """
+        equalweight = False pools every cell of an animal, so N is the number
+        of cells. equalweight = True averages the slice means instead, giving
+        each slice the same weight whatever its cell count, so N is the number
+        of slices.
+        """
+        assert type(equalweight) == bool, 'equalweight must be True or False'
+        self.equalweight = equalweight
+        self.columns = None
+        self._slicestats = None
+        self._animalstats = None
+
+    def fit(self, results):
+        self.columns = results.columns
+        self._slicestats = self._computeslices(results)
+        self._animalstats = self._computeanimals(self._slicestats)
+        return self
+
+    def update(self, results, cells):
+        """
+        Refresh only the slices and animals containing the given cells, which
+        may be any iterable of (Day, Slice, Cell) index entries.
+        """
+        if self._slicestats is None or not results.columns.equals(self.columns):
+            return self.fit(results)
+        slices = [tuple(i[:2]) for i in cells]
+        if len(slices) == 0:
+            return self
+        slices = pandas.MultiIndex.from_tuples(slices).unique()
+        rows = pandas.MultiIndex.from_arrays([results.index.get_level_values(0),
+                                              results.index.get_level_values(1)]).isin(slices)
+        newslices = self._computeslices(results[rows])
+        self._slicestats = self._replace(self._slicestats, newslices, self._slicestats.index.droplevel(0).isin(slices))
+        days = slices.get_level_values(0).unique()
+        slicestats = self._slicestats[self._slicestats.index.get_level_values(1).isin(days)]
+        newanimals = self._computeanimals(slicestats)
+        self._animalstats = self._replace(self._animalstats, newanimals, self._animalstats.index.droplevel(0).isin(days))
+        return self
+
+    @property
+    def sliceresults(self):
+        return self._table(self._slicestats)
+
+    @property
+    def animalresults(self):
+        return self._table(self._animalstats)
+
+    def _computeslices(self, results):
+        # single sorted groupby pass over the (Day, Slice) levels
+        values = results.apply(pandas.to_numeric, errors = 'coerce').astype(float)
+        grouped = values.sort_index().groupby(level = [0, 1], sort = True)
+        n = grouped.count()
+        mean = grouped.mean()
+        m2 = (grouped.var(ddof = 1)*(n - 1)).where(n > 1, 0.0)
+        return pandas.concat({'N' : n, 'Mean' : mean, 'M2' : m2}, names = ['Stat'])
+
+    def _computeanimals(self, slicestats):
+        n = self._part(slicestats, 'N')
+        mean = self._part(slicestats, 'Mean')
+        if self.equalweight:
+            grouped = mean.groupby(level = 0, sort = True)
+            count = grouped.count()
+            return pandas.concat({'N' : count,
+                                  'Mean' : grouped.mean(),
+                                  'M2' : (grouped.var(ddof = 1)*(count - 1)).where(count > 1, 0.0)}, names = ['Stat'])
+        # pooled, combining slice statistics with Chan's parallel formula
+        weighted = (mean*n).fillna(0)
+        total = n.groupby(level = 0, sort = True).sum()
+        pooled = weighted.groupby(level = 0, sort = True).sum()/total.where(total > 0)
+        deviation = (n*(mean - pooled.reindex(mean.index, level = 0))**2).fillna(0)
+        m2 = self._part(slicestats, 'M2').fillna(0).groupby(level = 0, sort = True).sum() + deviation.groupby(level = 0, sort = True).sum()
+        return pandas.concat({'N' : total, 'Mean' : pooled, 'M2' : m2.where(total > 0)}, names = ['Stat'])
+
+    def _part(self, stats, stat):
+        # empty stats have no Stat labels to select, keep the remaining levels
+        if stat in stats.index.get_level_values(0):
+            return stats.loc[stat]
+        return stats.iloc[0:0].droplevel(0)
+
+    def _replace(self, stats, new, stale):
+        return pandas.concat([stats[~stale], new]).sort_index()
+
+    def _table(self, stats):
+        if stats is None:
+            return pandas.DataFrame()
+        n = self._part(stats, 'N')
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            sem = np.sqrt(self._part(stats, 'M2')/(n - 1)/n).where(n > 1)
+        table = pandas.concat({'Mean' : self._part(stats, 'Mean'), 'SEM' : sem, 'N' : n}, axis = 1, names = ['Stat'])
+        table = table.reorder_levels([1, 2, 0], axis = 1)
+        return table.reindex(columns = pandas.MultiIndex.from_tuples([i + (s,) for i in self.columns for s in ['Mean', 'SEM', 'N']],
+                                                                     names = list(self.columns.names) + ['Stat']))